@@ -1,170 +1,308 @@
 import os
 import re
-import requests
-from bs4 import BeautifulSoup
+import asyncio
+import aiohttp
+from lxml import etree
 from urllib.parse import urljoin, urlparse
 from urllib.request import url2pathname
+from collections import defaultdict
 import sys
-import json
+import orjson
 import csv
 
-sys.setrecursionlimit(10000)
+# Upper bound on open connections across all hosts.
+MAX_CONCURRENCY = 500
+REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=10)
+# Seconds a resolved hostname is reused before it is looked up again.
+DNS_CACHE_TTL = 300
+# Responses larger than this many bytes are not parsed, and their download is cut short.
+MAX_PAGE_SIZE = 10 * 1024 * 1024
+# Pages fetched at once from any one host. A crawl mostly hits a single host, so
+# this is the limit that applies in practice. Requests waiting on it do not use
+# up their timeout the way requests waiting for a pooled connection do, so a wide
+# frontier queues instead of timing out. The connector's limit_per_host=10 is only
+# the socket ceiling above it and is never reached by page fetches.
+MAX_PER_HOST = 8
+_host_semaphores = defaultdict(lambda: asyncio.Semaphore(MAX_PER_HOST))
 
-def is_valid(url):
+# Attributes to search for potential URLs.
+URL_ATTRS = {"href", "src", "action", "data-href", "data-src", "data-url", "data-link", "oneclick"}
+
+# Compiled once here rather than on every get_all_links call.
+_CSS_URL_RE = re.compile(r'url\(([^)]+)\)')
+_HTTP_RE = re.compile(r'https?://[^\s"\'<>]+')
+_META_URL_RE = re.compile(r'url=([\S]+)', re.IGNORECASE)
+
+def make_session():
+    """
+    Create the single ClientSession shared by every request in a crawl, so
+    connections are pooled and kept alive across pages.
+    Must be called from inside the running event loop.
+    """
+    # Resolve through aiodns (c-ares) rather than getaddrinfo in a thread pool,
+    # and reuse answers for DNS_CACHE_TTL instead of aiohttp's default 10 seconds.
+    resolver = aiohttp.AsyncResolver()
+    connector = aiohttp.TCPConnector(
+        limit=MAX_CONCURRENCY, limit_per_host=10, resolver=resolver, ttl_dns_cache=DNS_CACHE_TTL
+    )
+    return aiohttp.ClientSession(connector=connector, timeout=REQUEST_TIMEOUT)
+
+def is_html_response(response):
+    """
+    Check from the headers alone whether a response is worth downloading and parsing:
+    its Content-Type must be HTML or XML (or missing), and its declared
+    Content-Length no larger than MAX_PAGE_SIZE.
+    """
+    content_type = response.headers.get("Content-Type", "").lower()
+    if content_type and "html" not in content_type and "xml" not in content_type:
+        return False
+    return (response.content_length or 0) <= MAX_PAGE_SIZE
+
+async def read_page_body(response):
+    """
+    Read a response body, or return None as soon as it grows past MAX_PAGE_SIZE.
+    Chunked responses and ones without a Content-Length get past is_html_response,
+    so the size cap is enforced on the read itself as well.
     """
-    Check if the URL is valid (has a scheme and network location).
+    body = bytearray()
+    while len(body) <= MAX_PAGE_SIZE:
+        # read(n) returns whatever has arrived, up to n bytes; b"" means EOF.
+        chunk = await response.content.read(MAX_PAGE_SIZE + 1 - len(body))
+        if not chunk:
+            return bytes(body)
+        body += chunk
+    return None
+
+def read_local_file(path):
+    """
+    Read a local file in full, or return None if it does not exist.
+    Called through asyncio.to_thread so neither the existence check nor
+    the read blocks the event loop.
+    """
+    if not os.path.exists(path):
+        return None
+    # A large buffer reads typical pages in one or two syscalls.
+    with open(path, "r", encoding="utf-8", buffering=1 << 20) as f:
+        return f.read()
+
+def is_internal(url, base_netloc):
     """
+    Check if the URL is a file:// URL, or is valid (has a scheme and network location)
+    and belongs to base_netloc. The URL is parsed at most once.
+    """
+    if url.startswith("file://"):
+        return True
     parsed = urlparse(url)
-    return bool(parsed.scheme) and bool(parsed.netloc)
+    return bool(parsed.scheme) and bool(parsed.netloc) and parsed.netloc == base_netloc
 
-def get_all_links(html_content, base_url):
+class PageTarget:
+    """
+    lxml parser target that collects what scrape_page needs while libxml2 parses the page.
+    No element tree is built: lxml only calls start() with each tag's attributes,
+    and data() for text, which is kept only inside the first <title>.
     """
-    Parse HTML and return a set of internal links.
+    def __init__(self):
+        self.title = None
+        self.images = []
+        self.url_candidates = []
+        self._title_parts = None
+
+    def start(self, tag, attrib):
+        if tag == "title" and self.title is None:
+            self._title_parts = []
+        elif tag == "img" and "src" in attrib:
+            self.images.append((attrib["src"], attrib.get("alt", "")))
+        elif tag == "meta" and attrib.get("http-equiv", "").lower() == "refresh":
+            # Capture meta refresh tags (e.g., <meta http-equiv="refresh" content="5;url=http://example.com/">)
+            match = _META_URL_RE.search(attrib.get("content", ""))
+            if match:
+                self.url_candidates.append(match.group(1).strip().strip('\'"'))
+        for attr, value in attrib.items():
+            if attr in URL_ATTRS and value:
+                self.url_candidates.append(value)
+
+    def end(self, tag):
+        if tag == "title" and self._title_parts is not None:
+            self.title = "".join(self._title_parts).strip()
+            self._title_parts = None
+
+    def data(self, text):
+        if self._title_parts is not None:
+            self._title_parts.append(text)
+
+    def close(self):
+        return self.title or "", self.images, self.url_candidates
+
+def parse_html(html_content):
+    """
+    Parse the page in a single streaming pass, with no element tree built.
     
-    This function scans common attributes (including oneclick), meta refresh tags,
-    inline CSS references, and uses regex to capture any URL-like strings.
+    Returns a tuple (title, images, url_candidates):
+      - title: the text of the first <title> tag, or "".
+      - images: (src, alt) for every <img> that has a src attribute.
+      - url_candidates: the raw value of every URL attribute (including oneclick)
+        and meta refresh target, in document order.
+    """
+    parser = etree.HTMLParser(target=PageTarget(), encoding="utf-8", huge_tree=True)
+    parser.feed(html_content.encode("utf-8"))
+    return parser.close()
+
+def get_all_links(url_candidates, html_content, base_url):
+    """
+    Return a list of internal links found in a page, in the order they were found.
+    
+    url_candidates are the attribute and meta refresh values collected by parse_html.
+    The raw html_content is also scanned for inline CSS references, and regex is used
+    to capture any URL-like strings.
     
     Only URLs that either start with file:// or belong to the same domain as base_url are returned.
     """
-    soup = BeautifulSoup(html_content, "html.parser")
-    links = set()
-    # Attributes to search for potential URLs.
-    url_attrs = ["href", "src", "action", "data-href", "data-src", "data-url", "data-link", "oneclick"]
-    for tag in soup.find_all(True):
-        for attr in url_attrs:
-            if tag.has_attr(attr):
-                url_candidate = tag.get(attr)
-                if url_candidate:
-                    full_url = urljoin(base_url, url_candidate)
-                    if full_url.startswith("file://"):
-                        links.add(full_url)
-                    elif is_valid(full_url) and urlparse(full_url).netloc == urlparse(base_url).netloc:
-                        links.add(full_url)
-    
-    # Capture meta refresh tags (e.g., <meta http-equiv="refresh" content="5;url=http://example.com/">)
-    for meta in soup.find_all("meta", attrs={"http-equiv": lambda x: x and x.lower() == "refresh"}):
-        content = meta.get("content", "")
-        match = re.search(r'url=([\S]+)', content, re.IGNORECASE)
-        if match:
-            url_candidate = match.group(1).strip().strip('\'"')
-            full_url = urljoin(base_url, url_candidate)
-            if full_url.startswith("file://"):
-                links.add(full_url)
-            elif is_valid(full_url) and urlparse(full_url).netloc == urlparse(base_url).netloc:
-                links.add(full_url)
+    base_netloc = urlparse(base_url).netloc
+    # A dict rather than a set, so links keep the order they appear in the page.
+    links = {}
+    for url_candidate in url_candidates:
+        full_url = urljoin(base_url, url_candidate)
+        if full_url not in links and is_internal(full_url, base_netloc):
+            links[full_url] = None
     
     # Capture URLs inside inline CSS (e.g., background-image: url(...))
-    css_urls = re.findall(r'url\(([^)]+)\)', html_content)
+    # Raw matches repeat a lot (nav bars, shared assets), so drop duplicates
+    # before doing the per-URL join and parse.
+    css_urls = dict.fromkeys(_CSS_URL_RE.findall(html_content))
     for css_url in css_urls:
         css_url = css_url.strip().strip('\'"')
         full_url = urljoin(base_url, css_url)
-        if full_url.startswith("file://"):
-            links.add(full_url)
-        elif is_valid(full_url) and urlparse(full_url).netloc == urlparse(base_url).netloc:
-            links.add(full_url)
+        if full_url not in links and is_internal(full_url, base_netloc):
+            links[full_url] = None
     
     # Additionally, use regex to catch any URLs in the raw HTML.
-    regex_pattern = r'https?://[^\s"\'<>]+'
-    for match in re.findall(regex_pattern, html_content):
+    for match in dict.fromkeys(_HTTP_RE.findall(html_content)):
         full_url = urljoin(base_url, match)
-        if full_url.startswith("file://"):
-            links.add(full_url)
-        elif is_valid(full_url) and urlparse(full_url).netloc == urlparse(base_url).netloc:
-            links.add(full_url)
-    return links
+        if full_url not in links and is_internal(full_url, base_netloc):
+            links[full_url] = None
+    return list(links)
 
-def scrape_page(url):
+async def scrape_page(session, url):
     """
     Scrape a page:
-      - For HTTP(s) URLs, fetch via requests.
+      - For HTTP(s) URLs, fetch through the shared aiohttp session.
       - For file URLs, read the local file.
-    Returns a dict with URL, title, text, images, and links.
+    Returns a dict with URL, title, images, and links.
     """
     try:
         if url.startswith("file://"):
             # Convert file:// URL to a local file path.
             path = url2pathname(urlparse(url).path)
-            if not os.path.exists(path):
+            content = await asyncio.to_thread(read_local_file, path)
+            if content is None:
                 print(f"Warning: Local file not found: {url}")
                 return None
-            with open(path, "r", encoding="utf-8") as f:
-                content = f.read()
         else:
-            response = requests.get(url, timeout=10)
-            if response.status_code != 200:
-                print(f"Warning: Received status code {response.status_code} for URL: {url}")
-                return None
-            # Ensure response text is decoded in UTF-8.
-            response.encoding = "utf-8"
-            content = response.text
+            async with _host_semaphores[urlparse(url).netloc]:
+                async with session.get(url) as response:
+                    if response.status != 200:
+                        print(f"Warning: Received status code {response.status} for URL: {url}")
+                        return None
+                    # PDFs, images, archives and the like have no links to parse,
+                    # so skip them before their body is downloaded.
+                    if not is_html_response(response):
+                        return {"url": url, "title": "", "images": [], "links": []}
+                    body = await read_page_body(response)
+                    if body is None:
+                        return {"url": url, "title": "", "images": [], "links": []}
+                    # Ensure response text is decoded in UTF-8.
+                    content = body.decode("utf-8", errors="replace")
 
-        soup = BeautifulSoup(content, "html.parser")
-        title = soup.title.string.strip() if soup.title and soup.title.string else ""
-        text = soup.get_text(separator=" ", strip=True)
+        title, img_tags, url_candidates = parse_html(content)
         images = []
-        for img in soup.find_all("img", src=True):
-            img_src = urljoin(url, img["src"])
-            alt_text = img.get("alt", "").strip()
+        for src, alt in img_tags:
+            img_src = urljoin(url, src)
+            alt_text = alt.strip()
             images.append({"original_url": img_src, "alt_text": alt_text})
-        links = get_all_links(content, url)
-        return {"url": url, "title": title, "text": text, "images": images, "links": links}
+        links = get_all_links(url_candidates, content, url)
+        return {"url": url, "title": title, "images": images, "links": links}
     except Exception as e:
         print(f"Error scraping {url}: {e}")
         return None
 
-def build_tree(url, base_domain, max_depth, visited):
+async def build_tree(session, root_url, base_domain, max_depth):
     """
-    Recursively scrape pages to build a tree structure of links.
+    Scrape pages breadth-first to build a tree structure of links.
     Each node contains the URL, title, list of directly found links, and children nodes.
+    All pages at one depth are fetched concurrently before moving to the next depth.
+    A page is scraped once, under the first (shallowest) parent that links to it.
     """
-    if url in visited:
-        return None
+    tree = None
+    visited = {root_url}
+    # Each entry is (url, parent node); the root has no parent.
+    frontier = [(root_url, None)]
+    for depth in range(max_depth + 1):
+        if not frontier:
+            break
+        for url, _ in frontier:
+            print(f"Scraping: {url}")
+        results = await asyncio.gather(*(scrape_page(session, url) for url, _ in frontier))
 
-    print(f"Scraping: {url}")
-    visited.add(url)
-    page_data = scrape_page(url)
-    if not page_data:
-        return None
+        next_frontier = []
+        for (url, parent), page_data in zip(frontier, results):
+            if not page_data:
+                continue
 
-    node = {
-        "url": page_data["url"],
-        "title": page_data["title"],
-        "links": sorted(page_data["links"]),
-        "children": []
-    }
-    if max_depth > 0:
-        for link in page_data["links"]:
-            # For file URLs, follow only file URLs.
-            if url.startswith("file://"):
-                if link.startswith("file://"):
-                    child = build_tree(link, base_domain, max_depth - 1, visited)
-                    if child:
-                        node["children"].append(child)
+            node = {
+                "url": page_data["url"],
+                "title": page_data["title"],
+                "links": page_data["links"],
+                "children": []
+            }
+            if parent is None:
+                tree = node
             else:
-                if urlparse(link).netloc == base_domain:
-                    child = build_tree(link, base_domain, max_depth - 1, visited)
-                    if child:
-                        node["children"].append(child)
-    return node
+                parent["children"].append(node)
+
+            if depth < max_depth:
+                for link in page_data["links"]:
+                    if link in visited:
+                        continue
+                    # For file URLs, follow only file URLs.
+                    if url.startswith("file://"):
+                        follow = link.startswith("file://")
+                    else:
+                        follow = urlparse(link).netloc == base_domain
+                    if follow:
+                        visited.add(link)
+                        next_frontier.append((link, node))
+        frontier = next_frontier
+    return tree
 
 def traverse_tree(node, unique_links=None):
     """
-    Recursively traverse the tree to collect unique URLs with their titles.
+    Traverse the tree depth-first to collect unique URLs with their titles.
     Returns a dictionary with URLs as keys and titles as values.
     """
     if unique_links is None:
         unique_links = {}
 
-    url = node.get("url")
-    if url and url not in unique_links:
-        unique_links[url] = node.get("title", "")
-    
-    for child in node.get("children", []):
-        traverse_tree(child, unique_links)
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        url = node.get("url")
+        if url and url not in unique_links:
+            unique_links[url] = node.get("title", "")
+        # Push children reversed so they are visited in their original order.
+        stack.extend(reversed(node.get("children", [])))
     
     return unique_links
 
+async def main(website_url, base_domain, max_depth):
+    """
+    Crawl website_url over one shared session and return the link tree.
+    """
+    async with make_session() as session:
+        return await build_tree(session, website_url, base_domain, max_depth)
+
 if __name__ == "__main__":
+    # link_tree.json is written compact unless --pretty is given.
+    pretty = "--pretty" in sys.argv[1:]
     website_url = input("Enter the website URL to crawl [default: https://hamzak.cloud]: ").strip()
     if not website_url:
         website_url = "https://hamzak.cloud"
@@ -180,13 +318,13 @@ if __name__ == "__main__":
     else:
         base_domain = parsed_base.netloc
 
-    visited = set()
-    tree = build_tree(website_url, base_domain, max_depth, visited)
+    tree = asyncio.run(main(website_url, base_domain, max_depth))
     
     # Save the link tree in an organized JSON format.
     output_json = "link_tree.json"
-    with open(output_json, "w", encoding="utf-8") as f:
-        json.dump(tree, f, indent=2, ensure_ascii=False)
+    # orjson always writes UTF-8 without escaping non-ASCII characters.
+    with open(output_json, "wb", buffering=1024 * 1024) as f:
+        f.write(orjson.dumps(tree, option=orjson.OPT_INDENT_2 if pretty else 0))
     
     print(f"\nLink tree has been saved to {output_json}")
 
@@ -195,10 +333,9 @@ if __name__ == "__main__":
     
     # Write the unique links to a CSV file.
     output_csv = "unique_links.csv"
-    with open(output_csv, "w", encoding="utf-8", newline="") as csvfile:
+    with open(output_csv, "w", encoding="utf-8", newline="", buffering=1024 * 1024) as csvfile:
         writer = csv.writer(csvfile)
         writer.writerow(["URL", "Title"])
-        for url, title in unique_links.items():
-            writer.writerow([url, title])
+        writer.writerows(unique_links.items())
     
     print(f"Unique links have been saved to {output_csv}")
@@ -1,19 +1,109 @@
 import os
 import re
 import csv
-import requests
+import asyncio
+import aiohttp
 import html  # for unescaping HTML entities
-from bs4 import BeautifulSoup
+import codecs
+from lxml import etree
 from urllib.parse import urljoin, urlparse
 from urllib.request import url2pathname
+from collections import defaultdict
 import sys
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
 sys.setrecursionlimit(10000)
 
 # Define the set of error status codes we care about. You can add more like 999, 401 etc.
 ERROR_CODES = {404}
 
+# Upper bound on requests in flight at once across the whole run.
+MAX_CONCURRENCY = 500
+REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=10)
+# Seconds a resolved hostname is reused before it is looked up again.
+DNS_CACHE_TTL = 300
+# Responses larger than this many bytes are not parsed, and their download is cut short.
+MAX_PAGE_SIZE = 10 * 1024 * 1024
+_semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+# Requests in flight to any one host. Waiting here happens before the request's
+# timeout starts, unlike waiting for a pooled connection, so a busy host queues
+# requests instead of timing them out.
+MAX_PER_HOST = 8
+_host_semaphores = defaultdict(lambda: asyncio.Semaphore(MAX_PER_HOST))
+
+# Attributes scanned on every tag for potential URLs.
+URL_ATTRS = {"href", "src", "action", "data-href", "data-src"}
+
+# Compiled once here rather than on every get_all_links call.
+_HTTP_RE = re.compile(r'https?://[^\s"\'<>]+')
+
+# Scrape results keyed by URL, so a page that is requested more than once in a
+# run is only fetched and parsed once. Holds the task rather than its result so
+# concurrent callers for the same URL share a single fetch.
+_page_cache = {}
+
+def make_session():
+    """
+    Create the single ClientSession shared by every request in a run, so
+    connections are pooled and kept alive across pages.
+    Must be called from inside the running event loop.
+    """
+    # Resolve through aiodns (c-ares) rather than getaddrinfo in a thread pool,
+    # and reuse answers for DNS_CACHE_TTL instead of aiohttp's default 10 seconds.
+    resolver = aiohttp.AsyncResolver()
+    connector = aiohttp.TCPConnector(
+        limit=MAX_CONCURRENCY, limit_per_host=10, resolver=resolver, ttl_dns_cache=DNS_CACHE_TTL
+    )
+    return aiohttp.ClientSession(connector=connector, timeout=REQUEST_TIMEOUT)
+
+def is_html_response(response):
+    """
+    Check from the headers alone whether a response is worth downloading and parsing:
+    its Content-Type must be HTML or XML (or missing), and its declared
+    Content-Length no larger than MAX_PAGE_SIZE.
+    """
+    content_type = response.headers.get("Content-Type", "").lower()
+    if content_type and "html" not in content_type and "xml" not in content_type:
+        return False
+    return (response.content_length or 0) <= MAX_PAGE_SIZE
+
+async def read_page_body(response):
+    """
+    Read a response body, or return None as soon as it grows past MAX_PAGE_SIZE.
+    Chunked responses and ones without a Content-Length get past is_html_response,
+    so the size cap is enforced on the read itself as well.
+    """
+    body = bytearray()
+    while len(body) <= MAX_PAGE_SIZE:
+        # read(n) returns whatever has arrived, up to n bytes; b"" means EOF.
+        chunk = await response.content.read(MAX_PAGE_SIZE + 1 - len(body))
+        if not chunk:
+            return bytes(body)
+        body += chunk
+    return None
+
+def read_local_file(path):
+    """
+    Read a local file in full, or return None if it does not exist.
+    Called through asyncio.to_thread so neither the existence check nor
+    the read blocks the event loop.
+    """
+    if not os.path.exists(path):
+        return None
+    # A large buffer reads typical pages in one or two syscalls.
+    with open(path, "r", encoding="utf-8-sig", buffering=1 << 20) as f:
+        return f.read()
+
+def decode_body(body, charset):
+    """
+    Decode a response body with its declared charset, falling back to UTF-8
+    when none is declared or Python has no codec by that name (e.g. "utf8mb4").
+    """
+    try:
+        encoding = codecs.lookup(charset or "utf-8").name
+    except LookupError:
+        encoding = "utf-8"
+    return body.decode(encoding, errors="replace")
+
 def is_valid(url):
     """
     Check if the URL is valid (has a scheme and network location).
@@ -21,129 +111,197 @@ def is_valid(url):
     parsed = urlparse(url)
     return bool(parsed.scheme) and bool(parsed.netloc)
 
-def get_all_links(html_content, base_url):
+class PageTarget:
+    """
+    lxml parser target that collects what scrape_page needs while libxml2 parses the page.
+    No element tree is built: lxml only calls start() with each tag's attributes,
+    and data() for text, which is kept only inside the first <title>.
+    """
+    def __init__(self):
+        self.title = None
+        self.images = []
+        self.url_candidates = []
+        self._title_parts = None
+
+    def start(self, tag, attrib):
+        if tag == "title" and self.title is None:
+            self._title_parts = []
+        elif tag == "img" and "src" in attrib:
+            self.images.append((attrib["src"], attrib.get("alt", "")))
+        for attr, value in attrib.items():
+            if attr in URL_ATTRS and value:
+                self.url_candidates.append(value)
+
+    def end(self, tag):
+        if tag == "title" and self._title_parts is not None:
+            self.title = "".join(self._title_parts).strip()
+            self._title_parts = None
+
+    def data(self, text):
+        if self._title_parts is not None:
+            self._title_parts.append(text)
+
+    def close(self):
+        return self.title or "", self.images, self.url_candidates
+
+def parse_html(html_content):
+    """
+    Parse the page in a single streaming pass, with no element tree built.
+    Returns a tuple (title, images, url_candidates): the text of the first <title> tag,
+    (src, alt) for every <img> with a src, and the raw value of every common URL
+    attribute (href, src, action, data-href, data-src) in document order.
     """
-    Parse HTML and return a set of all URLs found.
-    Scans every tag for common attributes (href, src, action, data-href, data-src)
-    and uses a regex to search the entire HTML for URL-like strings.
+    parser = etree.HTMLParser(target=PageTarget(), encoding="utf-8", huge_tree=True)
+    parser.feed(html_content.encode("utf-8"))
+    return parser.close()
+
+def get_all_links(url_candidates, html_content, base_url):
+    """
+    Return a list of all URLs found in a page, in the order they were found.
+    url_candidates are the attribute values collected by parse_html; a regex is also
+    used to search the raw html_content for URL-like strings.
     Before joining the URL, HTML entities (like &#x2B;) are unescaped.
     """
-    soup = BeautifulSoup(html_content, "html.parser")
-    links = set()
-    url_attrs = ["href", "src", "action", "data-href", "data-src"]
-    for tag in soup.find_all(True):
-        for attr in url_attrs:
-            if tag.has_attr(attr):
-                url_candidate = tag.get(attr)
-                if url_candidate:
-                    # Unescape HTML entities (e.g., &#x2B; becomes +)
-                    url_candidate = html.unescape(url_candidate)
-                    full_url = urljoin(base_url, url_candidate)
-                    # Accept file:// URLs and any valid http(s) URL.
-                    if full_url.startswith("file://") or is_valid(full_url):
-                        links.add(full_url)
-    regex_pattern = r'https?://[^\s"\'<>]+'
-    for match in re.findall(regex_pattern, html_content):
+    # A dict rather than a set, so links keep the order they appear in the page.
+    links = {}
+    for url_candidate in url_candidates:
+        # Unescape HTML entities (e.g., &#x2B; becomes +)
+        url_candidate = html.unescape(url_candidate)
+        full_url = urljoin(base_url, url_candidate)
+        # Accept file:// URLs and any valid http(s) URL.
+        if full_url not in links and (full_url.startswith("file://") or is_valid(full_url)):
+            links[full_url] = None
+    # Raw matches repeat a lot (nav bars, shared assets), so drop duplicates
+    # before unescaping and joining each one.
+    for match in dict.fromkeys(_HTTP_RE.findall(html_content)):
         unescaped_match = html.unescape(match)
         full_url = urljoin(base_url, unescaped_match)
-        if is_valid(full_url):
-            links.add(full_url)
-    return links
+        if full_url not in links and is_valid(full_url):
+            links[full_url] = None
+    return list(links)
 
-def scrape_page(url):
+async def scrape_page(session, url):
+    """
+    Return the scraped data for url, scraping it only the first time it is asked for.
+    """
+    if url not in _page_cache:
+        _page_cache[url] = asyncio.ensure_future(_scrape_page(session, url))
+    return await _page_cache[url]
+
+async def _scrape_page(session, url):
     """
     Retrieve the page content. For file:// URLs, reads the local file.
-    For http(s) URLs, sends a GET request.
-    Returns a dictionary with the page's URL, title, text, images, and links.
+    For http(s) URLs, sends a GET request through the shared session.
+    Returns a dictionary with the page's URL, title, images, and links.
     """
     try:
         if url.startswith("file://"):
             path = url2pathname(urlparse(url).path)
-            if not os.path.exists(path):
+            content = await asyncio.to_thread(read_local_file, path)
+            if content is None:
                 print(f"Warning: Local file not found: {url}")
                 return None
-            with open(path, "r", encoding="utf-8-sig") as f:
-                content = f.read()
         else:
-            response = requests.get(url, timeout=10)
-            if response.status_code != 200:
-                print(f"Warning: Received status code {response.status_code} for URL: {url}")
-                return None
-            content = response.text
+            async with _host_semaphores[urlparse(url).netloc], _semaphore:
+                async with session.get(url) as response:
+                    if response.status != 200:
+                        print(f"Warning: Received status code {response.status} for URL: {url}")
+                        return None
+                    # PDFs, images, archives and the like have no links to parse,
+                    # so skip them before their body is downloaded.
+                    if not is_html_response(response):
+                        return {"url": url, "title": "", "images": [], "links": []}
+                    body = await read_page_body(response)
+                    if body is None:
+                        return {"url": url, "title": "", "images": [], "links": []}
+                    # Decode with the declared charset (or UTF-8) instead of
+                    # letting aiohttp guess the encoding from the body.
+                    content = decode_body(body, response.charset)
 
-        soup = BeautifulSoup(content, "html.parser")
-        title = soup.title.string.strip() if soup.title and soup.title.string else ""
-        text = soup.get_text(separator=" ", strip=True)
+        title, img_tags, url_candidates = parse_html(content)
         images = []
-        for img in soup.find_all("img", src=True):
-            img_src = urljoin(url, img["src"])
-            alt_text = img.get("alt", "").strip()
+        for src, alt in img_tags:
+            img_src = urljoin(url, src)
+            alt_text = alt.strip()
             images.append({"original_url": img_src, "alt_text": alt_text})
-        links = get_all_links(content, url)
-        return {"url": url, "title": title, "text": text, "images": images, "links": links}
+        links = get_all_links(url_candidates, content, url)
+        return {"url": url, "title": title, "images": images, "links": links}
     except Exception as e:
         print(f"Error scraping {url}: {e}")
         return None
 
-def check_link(url):
+async def check_link(session, url):
     """
     Check the URL using a HEAD request.
     Returns a tuple (status, error). Only if status is in our ERROR_CODES set
     will the caller consider the link broken.
     """
     try:
-        response = requests.head(url, timeout=10, allow_redirects=True)
-        if response.status_code in ERROR_CODES:
-            return response.status_code, f"Status {response.status_code}"
-        return response.status_code, ""
+        async with _host_semaphores[urlparse(url).netloc], _semaphore:
+            async with session.head(url, allow_redirects=True) as response:
+                status = response.status
+        if status in ERROR_CODES:
+            return status, f"Status {status}"
+        return status, ""
     except Exception as e:
         return None, str(e)
 
-def process_input_url(url):
+async def process_input_url(session, url):
+    """
+    Scrape a single input URL and return the list of links found on it,
+    or None if the page could not be scraped. The links are not checked here;
+    main checks them in one batch across all input URLs.
+    
+    This function processes only the given URL (one level deep).
     """
-    Process a single input URL: scrape the page, extract all links,
-    and check each link (and the main page itself) using HEAD requests concurrently.
+    print(f"\nProcessing: {url}")
+    page_data = await scrape_page(session, url)
+    if not page_data:
+        return None
+    links = page_data["links"]
+    print(f"Found {len(links)} links on {url}.")
+    return links
+
+async def main(urls):
+    """
+    Scrape every input URL, then check each input page and each distinct link
+    using HEAD requests concurrently over one shared session. A URL is checked
+    only once, however many input pages link to it and whether or not it is an
+    input page itself.
     Only records with a status code in ERROR_CODES are returned.
     Each record is a dictionary with:
       - 'parent_url': The URL where the broken link was found.
       - 'broken_link': The broken URL.
       - 'status': The HTTP status code.
       - 'error': The error message.
-      
-    This function processes only the given URL (one level deep).
+    A broken link gets one record for every input page it was found on.
     """
     records = []
-    print(f"\nProcessing: {url}")
-    page_data = scrape_page(url)
-    if not page_data:
-        return records
-
-    # Check the main page itself.
-    status, error = check_link(url)
-    if status is not None and status in ERROR_CODES:
-        records.append({
-            "parent_url": url,
-            "broken_link": url,
-            "status": status,
-            "error": error or "Broken main page"
-        })
-
-    links = list(page_data["links"])
-    print(f"Found {len(links)} links on {url}. Checking concurrently...")
-    with ThreadPoolExecutor(max_workers=20) as executor:
-        future_to_link = {executor.submit(check_link, link): link for link in links}
-        for future in as_completed(future_to_link):
-            link = future_to_link[future]
-            try:
-                status, error = future.result()
-            except Exception as exc:
-                status, error = None, str(exc)
-            if status is not None and status in ERROR_CODES:
+    async with make_session() as session:
+        pages = await asyncio.gather(*(process_input_url(session, url) for url in urls))
+
+        # Every input page each URL was found on. Each scraped input page is
+        # also listed as its own parent, so the main page is checked too.
+        # Parents are dict keys rather than a list, so recording a parent stays
+        # O(1) however many input pages share a link.
+        link_to_parents = defaultdict(dict)
+        for url, links in zip(urls, pages):
+            if links is None:
+                continue
+            for link in [url, *links]:
+                link_to_parents[link][url] = None
+
+        print(f"\nChecking {len(link_to_parents)} unique URLs concurrently...")
+        results = await asyncio.gather(*(check_link(session, link) for link in link_to_parents))
+
+    for (link, parents), (status, error) in zip(link_to_parents.items(), results):
+        if status is not None and status in ERROR_CODES:
+            for parent in parents:
                 records.append({
-                    "parent_url": url,
+                    "parent_url": parent,
                     "broken_link": link,
                     "status": status,
-                    "error": error
+                    "error": error or ("Broken main page" if parent == link else "")
                 })
     return records
 
@@ -154,7 +312,6 @@ if __name__ == "__main__":
         sys.exit(1)
 
     output_csv = "broken_links_output.csv"
-    all_records = []
     urls = []
 
     # Determine file type by extension (case-insensitive)
@@ -176,18 +333,13 @@ if __name__ == "__main__":
                         urls.append(url)
 
     print(f"Processing {len(urls)} URLs concurrently...")
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        future_to_url = {executor.submit(process_input_url, url): url for url in urls}
-        for future in as_completed(future_to_url):
-            records = future.result()
-            all_records.extend(records)
+    all_records = asyncio.run(main(urls))
 
     # Write complete output CSV (only records with error status in ERROR_CODES).
-    with open(output_csv, "w", newline="", encoding="utf-8") as csvfile:
+    with open(output_csv, "w", newline="", encoding="utf-8", buffering=1024 * 1024) as csvfile:
         fieldnames = ["parent_url", "broken_link", "status", "error"]
         writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
         writer.writeheader()
-        for rec in all_records:
-            writer.writerow(rec)
+        writer.writerows(all_records)
 
     print(f"\nBroken link report written to {output_csv}.")